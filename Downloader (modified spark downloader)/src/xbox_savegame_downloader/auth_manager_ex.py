@@ -5,7 +5,8 @@ Authenticate with Windows Live Server and Xbox Live.
 """
 import logging
 import uuid
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Union
 
 import httpx
 
@@ -22,6 +23,19 @@ log = logging.getLogger("authentication")
 
 DEFAULT_SCOPES = ["Xboxlive.signin", "Xboxlive.offline_access"]
 
+AnyToken = Union[OAuth2TokenResponse, XADResponse, XAUResponse, XSTSResponse]
+
+
+def is_token_fresh(token: Optional[AnyToken], margin: timedelta = timedelta(0)) -> bool:
+    """Whether `token` is set and stays valid for at least `margin` longer."""
+    if token is None:
+        return False
+    if isinstance(token, OAuth2TokenResponse):
+        expires_at = token.issued + timedelta(seconds=token.expires_in)
+    else:
+        expires_at = token.not_after
+    return expires_at - margin > datetime.now(timezone.utc)
+
 
 class AuthenticationManagerEx:
     def __init__(
@@ -77,16 +91,26 @@ class AuthenticationManagerEx:
         self.user_token = await self.request_user_token()
         self.xsts_token = await self.request_xsts_token()
 
-    async def refresh_tokens(self) -> None:
-        """Refresh all tokens."""
-        if not (self.oauth and self.oauth.is_valid()):
+    async def refresh_tokens(self, margin: timedelta = timedelta(0)) -> bool:
+        """
+        Refresh the tokens that have expired, or will within `margin`.
+        Tokens that are still valid are kept without a request.
+        Returns whether any token was refreshed.
+        """
+        refreshed = False
+        if not is_token_fresh(self.oauth, margin):
             self.oauth = await self.refresh_oauth_token()
-        if not (self.device_token and self.device_token.is_valid()):
+            refreshed = True
+        if not is_token_fresh(self.device_token, margin):
             self.device_token = await self.request_device_token()
-        if not (self.user_token and self.user_token.is_valid()):
+            refreshed = True
+        if not is_token_fresh(self.user_token, margin):
             self.user_token = await self.request_user_token()
-        if not (self.xsts_token and self.xsts_token.is_valid()):
+            refreshed = True
+        if not is_token_fresh(self.xsts_token, margin):
             self.xsts_token = await self.request_xsts_token()
+            refreshed = True
+        return refreshed
 
     async def request_oauth_token(self, authorization_code: str) -> OAuth2TokenResponse:
         """Request OAuth2 token."""
@@ -1,12 +1,10 @@
 import os
+import re
 import asyncio
 import logging
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import unquote_plus
 from dotenv import load_dotenv
 
-from .xbox_save_manager import XboxSaveManager
-from .common import load_games_collection
-
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -15,6 +13,14 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 XBOX_CLIENT_ID = os.getenv("XBOX_CLIENT_ID")
 REDIRECT_URI = os.getenv("REDIRECT_URI")
+# Skip validation of games.json when it is known-good (set GAMES_JSON_TRUSTED=1)
+GAMES_JSON_TRUSTED = os.getenv("GAMES_JSON_TRUSTED") == "1"
+# Optional wall-clock limit (seconds) on the whole save download, not a per-transfer
+# inactivity timeout. Unset means no limit.
+DOWNLOAD_TIMEOUT = os.getenv("DOWNLOAD_TIMEOUT")
+
+# Pulls the "code" query parameter out of the pasted redirect URL
+AUTH_CODE_RE = re.compile(r"[?&]code=([^&#]+)")
 
 async def async_main():
     if not all([XBOX_CLIENT_ID, REDIRECT_URI]):
@@ -24,82 +30,108 @@ async def async_main():
         )
         return
 
-    games = load_games_collection("games.json")
-    games_list = list(games.root.items())
+    download_timeout = None
+    if DOWNLOAD_TIMEOUT:
+        try:
+            download_timeout = float(DOWNLOAD_TIMEOUT)
+            if not download_timeout > 0:
+                raise ValueError
+        except ValueError:
+            logger.critical(f"CRITICAL: DOWNLOAD_TIMEOUT must be a positive number of seconds, got {DOWNLOAD_TIMEOUT!r}.")
+            return
+
+    # Imported here rather than at module level: xbox_save_manager pulls in httpx, pydantic
+    # and the xbox-webapi stack, which the missing-config path above doesn't need.
+    from .xbox_save_manager import XboxSaveManager
+    from .common import load_games_collection, load_games_collection_fast
+
+    if GAMES_JSON_TRUSTED:
+        games = load_games_collection_fast("games.json")
+    else:
+        games = load_games_collection("games.json")
+    games_list = list(games.items())
 
     # Initialize XboxSaveManager
     xbox_manager = XboxSaveManager(
         client_id=XBOX_CLIENT_ID,
         redirect_uri=REDIRECT_URI,
         tokens_file="user_tokens.json",
-        download_dir="downloads"
+        download_dir="downloads",
+        games=games,
     )
 
-    token_data = xbox_manager.user_tokens_data.root.get("cli_user")
-
-    if not token_data or not token_data.xsts_token or not token_data.xsts_token.is_valid():
-        # Generate auth URL
-        auth_url = await xbox_manager.generate_auth_url()
-        print("\nPlease authenticate with Xbox Live:")
-        print(f"1. Open this URL in your browser: {auth_url}")
-        print("2. Sign in with your Xbox account")
-        print("3. Copy the entire URL from your browser's address bar after being redirected")
+    # Closes the manager's sessions once everything is done
+    async with xbox_manager:
+        # Only ask for the browser login if there is no valid token and the stored one can't be refreshed
+        if not xbox_manager.has_valid_tokens("cli_user") and not await xbox_manager.try_refresh_tokens("cli_user"):
+            # Generate auth URL
+            auth_url = await xbox_manager.generate_auth_url()
+            print("\nPlease authenticate with Xbox Live:")
+            print(f"1. Open this URL in your browser: {auth_url}")
+            print("2. Sign in with your Xbox account")
+            print("3. Copy the entire URL from your browser's address bar after being redirected")
         
-        # Get auth code from user
-        auth_code = input("\nPaste the redirect URL here: ").strip()
+            # Get auth code from user
+            auth_code = input("\nPaste the redirect URL here: ").strip()
 
-        auth_code = parse_qs(urlparse(auth_code).query).get('code', [None])[0]
+            m = AUTH_CODE_RE.search(auth_code)
+            auth_code = unquote_plus(m.group(1)) if m else None
         
-        if not auth_code:
-            print("❌ Could not extract code from the URL. Please ensure you copied the entire redirect URL.")
+            if not auth_code:
+                print("❌ Could not extract code from the URL. Please ensure you copied the entire redirect URL.")
+                return
+
+            # Process authentication
+            print("\n⏳ Processing authentication...")
+            if not await xbox_manager.process_auth_code(auth_code, "cli_user"):
+                print("❌ Processing auth code failed.")
+                return
+
+            print("✅ Authenticated")
+
+        # Select game version
+        print("\nSelect game version:")
+        for i, kvp in enumerate(games_list):
+            name, _ = kvp
+            print(f"{i}. {name}")
+
+    # choice was set to 0 manually, as KSP is the only game within this version's games.json
+        chosen_game = None
+        while True:
+            try:
+                choice = 0
+                chosen_game = games_list[choice]
+                break
+            except (ValueError, IndexError):
+                print(f"Invalid choice. Please enter any of the following: {', '.join([str(i) for i in range(len(games))])}.")
+
+        game_title, game_meta = chosen_game
+        print(f"Chosen game: {game_title} -> {game_meta}") 
+
+        # Get Titlestorage context
+        dl_context = await xbox_manager.get_titlestorage_context("cli_user", game_meta.scid, game_meta.pfn)
+
+        # Download save files
+        print(f"\n⏳ Downloading {game_title} saves...")
+        try:
+            async with asyncio.timeout(download_timeout):
+                res = await dl_context.download_save_files()
+        except TimeoutError:
+            print(f"❌ Download timed out after {download_timeout:g} seconds")
             return
-
-        # Process authentication
-        print("\n⏳ Processing authentication...")
-        if not await xbox_manager.process_auth_code(auth_code, "cli_user"):
-            print("❌ Processing auth code failed.")
+        if not res:
+            print("❌ Failed downloading savegames")
             return
 
-        print("✅ Authenticated")
-
-    # Select game version
-    print("\nSelect game version:")
-    for i, kvp in enumerate(games_list):
-        name, _ = kvp
-        print(f"{i}. {name}")
-
-# choice was set to 0 manually, as KSP is the only game within this version's games.json
-    chosen_game = None
-    while True:
-        try:
-            choice = 0
-            chosen_game = games_list[choice]
-            break
-        except (ValueError, IndexError):
-            print(f"Invalid choice. Please enter any of the following: {', '.join([str(i) for i in range(len(games))])}.")
-
-    game_title, game_meta = chosen_game
-    print(f"Chosen game: {game_title} -> {game_meta}") 
-
-    # Get Titlestorage context
-    dl_context = await xbox_manager.get_titlestorage_context("cli_user", game_meta.scid, game_meta.pfn)
-
-    # Download save files
-    print(f"\n⏳ Downloading {game_title} saves...")
-    res = await dl_context.download_save_files()
-    if not res:
-        print("❌ Failed downloading savegames")
-        return
-
-    download_dir, zip_filepath = res
-    print(f"✅ Save files have been downloaded to: {download_dir}")
-    print(f"✅ Zip: {zip_filepath}")
+        download_dir, zip_filepath = res
+        print(f"✅ Save files have been downloaded to: {download_dir}")
+        print(f"✅ Zip: {zip_filepath}")
     
-    # Ask if user wants to clean up - has been set to "n" manually.
-    cleanup = "n"
-    if cleanup == 'y':
-        await dl_context.cleanup_files(download_dir)
-        print("✅ Files cleaned up successfully.")
+        # Ask if user wants to clean up - has been set to "n" manually.
+        cleanup = "n"
+        if cleanup == 'y':
+            await dl_context.cleanup_files(download_dir)
+            print("✅ Files cleaned up successfully.")
 
 def main():
     asyncio.run(async_main()) 
@@ -1,6 +1,10 @@
+import json
+import os
 from enum import StrEnum
+from functools import lru_cache
+from pathlib import Path
 from typing import Dict
-from pydantic import BaseModel, RootModel
+from pydantic import BaseModel, TypeAdapter
 
 class SaveMethod(StrEnum):
     AtomFilename = "atom_filename"
@@ -13,23 +17,28 @@ class GameMetadata(BaseModel):
     jsonpath_filter: str = "atoms.*"
     save_method: SaveMethod = SaveMethod.AtomFilename
 
-class GameMetadataCollection(RootModel):
-    root: Dict[str, GameMetadata]
+# Game title -> metadata, as stored in games.json
+GameMetadataCollection = Dict[str, GameMetadata]
 
-    def __iter__(self):
-        return iter(self.root)
+_GAMES_ADAPTER = TypeAdapter(GameMetadataCollection)
 
-    def __getitem__(self, item):
-        return self.root[item]
-    
-    def __setitem__(self, key, val):
-        self.root[key] = val
-    
-    def __len__(self):
-        return len(self.root.items())
+@lru_cache(maxsize=4)
+def _load_games_collection_cached(filepath: str, mtime_ns: int) -> GameMetadataCollection:
+    # mtime_ns is only part of the cache key, so an edited file gets re-parsed
+    data = Path(filepath).read_bytes()
+    return _GAMES_ADAPTER.validate_json(data)
 
 def load_games_collection(filepath: str) -> GameMetadataCollection:
-    """Load user tokens from the tokens file."""
-    with open(filepath, 'rt') as f:
-        data = f.read()
-        return GameMetadataCollection.model_validate_json(data)
+    """
+    Load the games collection from a games.json file.
+    Repeat loads of an unchanged file return the same (cached) dict; don't mutate it.
+    """
+    return _load_games_collection_cached(filepath, os.stat(filepath).st_mtime_ns)
+
+def load_games_collection_fast(filepath: str) -> GameMetadataCollection:
+    """
+    Load the games collection without validation.
+    Only use this for a trusted games.json (e.g. the one shipped with the repo).
+    """
+    raw = json.loads(Path(filepath).read_bytes())
+    return {name: GameMetadata.model_construct(**entry) for name, entry in raw.items()}
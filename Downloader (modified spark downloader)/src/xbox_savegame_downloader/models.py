@@ -5,7 +5,7 @@ from pathlib import Path
 from enum import StrEnum
 from datetime import datetime
 from typing import Dict, List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class SavegameBlobType(StrEnum):
     Unknown = "unknown"
@@ -16,16 +16,24 @@ class SavegameBlobType(StrEnum):
 
     @staticmethod
     def get_type_for_str(input_str: str) -> "SavegameBlobType":
-        for (_, enum_val) in SavegameBlobType._member_map_.items():
-            if input_str.endswith(f",{enum_val.value}"):
+        for (suffix, enum_val) in _BLOB_TYPE_SUFFIXES:
+            if input_str.endswith(suffix):
                 return enum_val
         return SavegameBlobType.Unknown
 
+# (",<type>", SavegameBlobType) pairs, built once instead of per lookup
+_BLOB_TYPE_SUFFIXES = tuple((f",{enum_val.value}", enum_val) for enum_val in SavegameBlobType)
+
+# Response models are read-only once parsed; unknown keys from the APIs are dropped
+_RESPONSE_CONFIG = ConfigDict(frozen=True, extra="ignore")
+
 """
 Dbox API
 """
 
 class DboxGameResponse(BaseModel):
+    model_config = _RESPONSE_CONFIG
+
     title_id: str
     name: str
     systems: List[str]
@@ -38,10 +46,17 @@ Titlestorage models
 """
 
 class PagingInfo(BaseModel):
+    model_config = _RESPONSE_CONFIG
+
     totalItems: int
     continuationToken: Optional[str] = None
 
+# Blob filenames encode "." as "X" and "_" as "E"
+_FILENAME_TRANS = str.maketrans({"X": ".", "E": "_"})
+
 class BlobMetadata(BaseModel):
+    model_config = _RESPONSE_CONFIG
+
     fileName: str
     displayName: Optional[str] = None
     etag: str
@@ -53,8 +68,7 @@ class BlobMetadata(BaseModel):
             self.fileName
                 .removeprefix("/")
                 .removesuffix(",savedgame")
-                .replace("X", ".")
-                .replace("E", "_")
+                .translate(_FILENAME_TRANS)
         )
         return Path(filename)
 
@@ -63,8 +77,13 @@ class BlobMetadata(BaseModel):
         return SavegameBlobType.get_type_for_str(self.fileName)
 
 class BlobsResponse(BaseModel):
+    # Not frozen: pages are accumulated into the first response while listing blobs
+    model_config = ConfigDict(extra="ignore")
+
     blobs: List[BlobMetadata]
     pagingInfo: PagingInfo
 
 class SavegameAtoms(BaseModel):
+    model_config = _RESPONSE_CONFIG
+
     atoms: Dict[str, str]
@@ -4,15 +4,17 @@ import re
 import json
 import zipfile
 import asyncio
-import aiofiles
 import logging
 import shutil
+import tempfile
 import jsonpath_ng
+from functools import cached_property, lru_cache
+from jsonpath_ng.parser import JsonPathParser
 from pathlib import Path
-from datetime import datetime
-from typing import Any, Iterable, List, Optional, Dict, Tuple
-from httpx import HTTPStatusError
-from pydantic import BaseModel, RootModel
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, List, Optional, Dict, Set, Tuple, Union
+from httpx import HTTPStatusError, Request, Response
+from pydantic import BaseModel, RootModel, TypeAdapter
 
 from xbox.webapi.common.exceptions import AuthenticationException
 from xbox.webapi.authentication.models import OAuth2TokenResponse, XAUResponse, XADResponse, XSTSResponse
@@ -24,6 +26,66 @@ from .auth_manager_ex import AuthenticationManagerEx
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on blob downloads in flight at once, so large saves don't open hundreds of
+# connections at the same time (and get throttled for it)
+MAX_CONCURRENT_DOWNLOADS = 16
+
+# Stored tokens that expire within this margin are refreshed up front, so they can't
+# lapse part way through a download
+TOKEN_REFRESH_MARGIN = timedelta(minutes=2)
+
+# Atom-metadata files parsed per worker-thread task
+FIND_ATOMS_BATCH_SIZE = 64
+
+# Zip entries are compressed one at a time, so a fast deflate level keeps the zip from
+# falling behind the downloads; the savegames are text and still compress well
+ZIP_COMPRESS_LEVEL = 1
+
+# Size of the chunks downloaded blobs are streamed to disk in
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# jsonpath_ng.parse() builds a new parser (and its PLY tables) on every call; share one
+_JSONPATH_PARSER = JsonPathParser()
+
+@lru_cache(maxsize=256)
+def parse_jsonpath(expr: str) -> jsonpath_ng.JSONPath:
+    """Parse a jsonpath expression, reusing the result for expressions seen before."""
+    return _JSONPATH_PARSER.parse(expr)
+
+_ATOMS_FIELD = jsonpath_ng.Fields("atoms")
+
+def simple_atoms_field(jsonpath_expr: jsonpath_ng.JSONPath) -> Optional[str]:
+    """
+    If `jsonpath_expr` is one of the common "atoms.*" / "atoms.<key>" filters, return
+    "*" or that key, so it can be applied with plain dict lookups. Otherwise None.
+    """
+    if (
+        isinstance(jsonpath_expr, jsonpath_ng.Child)
+        and jsonpath_expr.left == _ATOMS_FIELD
+        and isinstance(jsonpath_expr.right, jsonpath_ng.Fields)
+        and len(jsonpath_expr.right.fields) == 1
+    ):
+        return jsonpath_expr.right.fields[0]
+    return None
+
+def find_atoms(data: Any, jsonpath_expr: jsonpath_ng.JSONPath, atoms_field: Optional[str]) -> List[Tuple[str, Any]]:
+    """
+    Apply the filter to a parsed atom-metadata file. Returns (path, value) pairs, the same
+    as str(match.path) and match.value of jsonpath_expr.find(data) would give.
+    `atoms_field` is simple_atoms_field(jsonpath_expr); if it's set, jsonpath_ng is skipped.
+    """
+    if atoms_field is None:
+        return [(str(match.path), match.value) for match in jsonpath_expr.find(data)]
+    atoms = data.get("atoms") if isinstance(data, dict) else None
+    if not isinstance(atoms, dict):
+        return []
+    if atoms_field == "*":
+        # str(Fields(key)) quotes keys the same way the jsonpath match's path would
+        return [(str(jsonpath_ng.Fields(key)), value) for key, value in atoms.items()]
+    if atoms_field in atoms:
+        return [(str(jsonpath_ng.Fields(atoms_field)), atoms[atoms_field])]
+    return []
+
 class DiscordUserXblContext(BaseModel):
     oauth: OAuth2TokenResponse
     device_token: XADResponse
@@ -44,6 +106,70 @@ class UserTokenData(RootModel):
     def __setitem__(self, key, val):
         self.root[key] = val
 
+# Reads and writes the tokens file as raw bytes
+_TOKENS_ADAPTER = TypeAdapter(UserTokenData)
+
+@lru_cache(maxsize=4)
+def _load_user_tokens_cached(tokens_file: str, mtime_ns: int, size: int) -> Optional[UserTokenData]:
+    # mtime_ns and size are only part of the cache key, so a changed file gets re-parsed.
+    # Returns None for an empty file.
+    with open(tokens_file, 'rb') as f:
+        data = f.read()
+    if not data:
+        return None
+    # pydantic parses the raw bytes itself; no str decode first
+    return _TOKENS_ADAPTER.validate_json(data)
+
+async def _send_signed_streaming(session: SignedSession, method: str, url: str, **kwargs) -> Response:
+    """
+    Like SignedSession.send_signed, but returns a streamed response; the caller must aclose() it.
+    SignedSession has no public way to sign a request without also sending it buffered, so
+    this uses its private _prepare_signed_request (as of the pinned xbox-webapi commit
+    0a7aeac9f746466001964743d7a1e8e670560a2b). Check it again when upgrading xbox-webapi.
+    """
+    # A bare Request, exactly as send_signed builds it, so no client default headers get signed
+    request = Request(method, url, **kwargs)
+    return await session.send(session._prepare_signed_request(request), stream=True)
+
+class ZipAppender:
+    """
+    Writes a zip archive from concurrent download tasks. Writes are serialized with a
+    lock (ZipFile isn't safe for concurrent writers) and the compression runs in a
+    worker thread, off the event loop. Entries are named relative to `root`.
+    Use it with `async with`, which closes the zip once every pending write is done.
+    """
+    def __init__(self, zip_filepath: Path, root: Path):
+        self.zf = zipfile.ZipFile(zip_filepath, 'w', zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESS_LEVEL)
+        self.root = root
+        self._lock = asyncio.Lock()
+        self._pending: Set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> "ZipAppender":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def add_file(self, path: Path) -> None:
+        # The write runs as a task of its own, shielded from the caller's cancellation:
+        # cancelling a to_thread() call doesn't stop its thread, which would still be
+        # writing into the zip when it gets closed
+        task = asyncio.ensure_future(self._write_file(path))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        await asyncio.shield(task)
+
+    async def _write_file(self, path: Path) -> None:
+        async with self._lock:
+            await asyncio.to_thread(self.zf.write, path, path.relative_to(self.root))
+
+    async def aclose(self) -> None:
+        """Wait for the writes still in flight (e.g. after a cancel), then close the zip."""
+        try:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        finally:
+            self.zf.close()
+
 class TitleStorageContext:
     def __init__(
         self,
@@ -62,14 +188,32 @@ class TitleStorageContext:
         self.auth_header_value = self.xtoken.authorization_header_value
         self.xuid = self.xtoken.xuid
         self.gamertag = self.xtoken.gamertag or f"User_{self.xuid}"
+        # Gamertag as used in zip filenames
+        self._safe_gamertag = self.gamertag.replace(' ', '_')
         self.pfn = pfn
         self.scid = scid
         self.jsonpath_expr = jsonpath_expr
+        self._atoms_field = simple_atoms_field(jsonpath_expr)
+        # For an "atoms.<key>" filter, metadata files that don't contain the key's quoted
+        # name can't match, so they are skipped without being parsed. Only plain keys,
+        # which a JSON encoder never escapes, are checked this way.
+        self._atoms_key_token: Optional[bytes] = None
+        if (
+            self._atoms_field not in (None, "*")
+            and self._atoms_field.isascii()
+            and self._atoms_field.replace("_", "").isalnum()
+        ):
+            self._atoms_key_token = b'"' + self._atoms_field.encode("ascii") + b'"'
         self.save_method = save_method
         self.download_dir_root = download_dir_root
+        self._download_sem = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        # Folders already created for downloaded files
+        self._created_dirs: Set[Path] = set()
 
-    @property
+    @cached_property
     def common_headers(self) -> Dict[str, Any]:
+        # Built once: nothing in it changes over the context's lifetime, and httpx copies
+        # the headers into each request rather than modifying this dict
         return {
             "Authorization": self.auth_header_value,
             "x-xbl-contract-version": "107",
@@ -85,13 +229,14 @@ class TitleStorageContext:
         resp.raise_for_status()
         blobs_response = BlobsResponse.model_validate_json(resp.content)
 
+        # Updated in place for each page; httpx copies the params into the request
+        params: Dict[str, Any] = {}
         while blobs_response.pagingInfo.continuationToken is not None:
             # There are more items to fetch, indicated by continuationToken
-            params = {
-                "skipItems": len(blobs_response.blobs),
-                "continuationToken": blobs_response.pagingInfo.continuationToken
-            }
+            params["skipItems"] = len(blobs_response.blobs)
+            params["continuationToken"] = blobs_response.pagingInfo.continuationToken
             resp = await self.session.send_signed("GET", download_url, headers=self.common_headers, params=params)
+            resp.raise_for_status()
             tmp = BlobsResponse.model_validate_json(resp.content)
             # Append blobs to initial response object, overwrite pagingInfo with current version
             blobs_response.blobs.extend(tmp.blobs)
@@ -103,21 +248,92 @@ class TitleStorageContext:
         self,
         filename: str,
         target_localpath: Path,
+        zip_appender: Optional[ZipAppender] = None,
     ) -> Path:
-        """Returns filepath"""
+        """Returns filepath. If `zip_appender` is given, the file is also added to that zip."""
         # Download files
         logger.debug(f"Downloading file {filename}")
         download_url = f"https://titlestorage.xboxlive.com/connectedstorage/users/xuid({self.xuid})/scids/{self.scid}/{filename}"
-        resp = await self.session.send_signed("GET", download_url, headers=self.common_headers)
-        resp.raise_for_status()
-        contents = await resp.aread()
+        async with self._download_sem:
+            # Streamed straight to disk, so at most one chunk per download is held in memory.
+            # It goes to a temporary name first and is only renamed into place once complete,
+            # so a transfer that breaks off never leaves a truncated file behind.
+            resp = await _send_signed_streaming(self.session, "GET", download_url, headers=self.common_headers)
+            try:
+                resp.raise_for_status()
+                partial_path = target_localpath.with_name(target_localpath.name + ".part")
+                fp = await asyncio.to_thread(self._open_for_write, partial_path)
+                try:
+                    async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        await asyncio.to_thread(fp.write, chunk)
+                except BaseException:
+                    await asyncio.to_thread(self._discard_partial, fp, partial_path)
+                    raise
+                await asyncio.to_thread(self._finish_partial, fp, partial_path, target_localpath)
+            finally:
+                await resp.aclose()
+        if zip_appender is not None:
+            await zip_appender.add_file(target_localpath)
+        return target_localpath
+
+    async def _download_blob_files(
+        self,
+        to_download: List[Tuple[str, Path]],
+        zip_appender: Optional[ZipAppender] = None,
+    ) -> List[Union[Path, Exception]]:
+        """
+        Download all (remote filename, local filepath) pairs concurrently (bounded by
+        MAX_CONCURRENT_DOWNLOADS). Returns, in the same order, either the local filepath
+        or the exception that download raised; one failure doesn't cancel the others.
+        """
+        async def download_or_exception(remote_filename: str, local_filepath: Path) -> Union[Path, Exception]:
+            try:
+                return await self._download_blob_file(remote_filename, local_filepath, zip_appender)
+            except Exception as exc:
+                return exc
+
+        async with asyncio.TaskGroup() as tg:
+            tasks = [
+                tg.create_task(download_or_exception(remote_filename, local_filepath))
+                for (remote_filename, local_filepath) in to_download
+            ]
+        return [task.result() for task in tasks]
+
+    def _open_for_write(self, path: Path) -> BinaryIO:
+        # Many files share a folder, so each folder is only created once (mkdir on an
+        # existing folder still costs a failed mkdir plus a stat)
+        parent = path.parent
+        if parent not in self._created_dirs:
+            parent.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(parent)
+        return path.open("wb")
 
-        if not target_localpath.parent.exists():
-            target_localpath.parent.mkdir(parents=True, exist_ok=True)
+    @staticmethod
+    def _finish_partial(fp: BinaryIO, partial_path: Path, target_path: Path) -> None:
+        fp.close()
+        os.replace(partial_path, target_path)
 
-        async with aiofiles.open(target_localpath, 'wb') as f:
-            await f.write(contents)
-        return target_localpath
+    @staticmethod
+    def _discard_partial(fp: BinaryIO, partial_path: Path) -> None:
+        try:
+            fp.close()
+        finally:
+            partial_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _write_blobs_list(path: Path, blobs_response: BlobsResponse) -> None:
+        with open(path, "wt") as f:
+            f.write(blobs_response.model_dump_json(indent=2))
+
+    def _find_atoms(self, filepath: Path) -> List[Tuple[str, Any]]:
+        """Load a downloaded atom-metadata file and return the filter's (path, value) matches in it."""
+        raw = filepath.read_bytes()
+        if self._atoms_key_token is not None and self._atoms_key_token not in raw:
+            return []
+        return find_atoms(json.loads(raw), self.jsonpath_expr, self._atoms_field)
+
+    def _find_atoms_batch(self, filepaths: List[Path]) -> List[List[Tuple[str, Any]]]:
+        return [self._find_atoms(filepath) for filepath in filepaths]
 
     async def download_save_files(self) -> Optional[Tuple[Path, Path]]:
         """
@@ -129,13 +345,15 @@ class TitleStorageContext:
 
         # Create unique dir/filenames for this invocation
         request_id = f"{self.user_id}_{int(datetime.now().timestamp())}"
-        zip_filename = f"{self.pfn}_Saves_{self.gamertag.replace(' ', '_')}_{request_id}.zip"
+        zip_filename = f"{self.pfn}_Saves_{self._safe_gamertag}_{request_id}.zip"
         download_dir = self.download_dir_root.joinpath(request_id)
         zip_filepath = download_dir.joinpath(zip_filename)
 
         metadata_dl_path = download_dir.joinpath("_meta")
         # also creates the parent `download_path`
         metadata_dl_path.mkdir(parents=True, exist_ok=True)
+        # Folders from an earlier run may have been cleaned up since
+        self._created_dirs.clear()
         
         """
         1. Download metadata (List of blobs)
@@ -143,11 +361,10 @@ class TitleStorageContext:
         logger.info("Downloading list of blobs...")
         blobs_response = await self._download_blob_list()
 
-        # Write out the json response to a file (for debugging and completeness)
+        # Write out the json response to a file (for debugging and completeness). It is
+        # serialized in a worker thread, since it grows with the number of blobs.
         blobs_filepath = metadata_dl_path.joinpath("blobs_list.json")
-        with open(blobs_filepath, "wt") as f:
-            data = blobs_response.model_dump_json(indent=2)
-            f.write(data)
+        await asyncio.to_thread(self._write_blobs_list, blobs_filepath, blobs_response)
 
         logger.info(f"Downloaded blob-metadata with {len(blobs_response.blobs)} entries")
 
@@ -156,107 +373,101 @@ class TitleStorageContext:
         """
         # Create list of atom metadata to download: remote filename and their local filepath
         to_download: List[Tuple[str, Path]] = []
-        for blob in blobs_response.blobs:
-            normalized_filepath = blob.normalized_filepath()
+        # Normalized once per blob here, and reused for the binaries' paths in step 3
+        normalized_filepaths = [blob.normalized_filepath() for blob in blobs_response.blobs]
+        for blob, normalized_filepath in zip(blobs_response.blobs, normalized_filepaths):
             localpath = (
                 metadata_dl_path
                     .joinpath(normalized_filepath.parent, normalized_filepath.name + ".meta.json")
             )
             to_download.append((blob.fileName, localpath))
 
-        downloaded_metadata_files = await asyncio.gather(
-            *(self._download_blob_file(remote_filename, local_filepath)
-                for (remote_filename, local_filepath) in to_download),
-                return_exceptions=True
-        )
-
-        if not downloaded_metadata_files:
+        if not to_download:
             logger.warning("Failed to download any atom-metadata files")
             return None
-        
-        raised_exceptions = [x for x in downloaded_metadata_files if isinstance(x, Exception)]
-        successfully_downloaded_metadata_files = [x for x in downloaded_metadata_files if isinstance(x, Path)]
 
-        for exc in raised_exceptions:
-            logger.error(f"Failed downloading metadata file, exception: {exc}")
+        # Files are added to the zip as each download finishes (compressed in a worker
+        # thread), so zipping overlaps with the remaining downloads instead of running
+        # as a separate pass at the end
+        async with ZipAppender(zip_filepath, download_dir) as zip_appender:
+            await zip_appender.add_file(blobs_filepath)
 
-        logger.info(f"Downloaded {len(successfully_downloaded_metadata_files)} atom-metadata files (Failed: {len(raised_exceptions)})")
+            downloaded_metadata_files = await self._download_blob_files(to_download, zip_appender)
 
-        """
-        3. Download binaries (Actual atom binaries, filtered to grab only non-metadata ones)
+            raised_exceptions = [x for x in downloaded_metadata_files if isinstance(x, Exception)]
+            successfully_downloaded_metadata_files = [x for x in downloaded_metadata_files if isinstance(x, Path)]
 
-        NOTE: There are atoms for binary files and ones for timestamps and other metadata.
-              We only care about the binary files, returned by the jsonpath-filter!
-        """
-        # Create a mapping of actual filepath and BlobMetadata
-        filepath_map = list(zip(downloaded_metadata_files, blobs_response.blobs))
-
-        # Filter out the ones that threw an exception when downloading
-        filepath_map = [(path, meta) for (path, meta) in filepath_map if isinstance(path, Path)]
-
-        #with open(blobs_filemapping, "wt") as f:
-        #    json.dump(f, filepath_map, indent=2)
-
-        # Assemble list of files to download / transform
-        to_download.clear()
-
-        for filepath, blob_meta in filepath_map:
-            with open(filepath, "rt") as f:
-                data = json.load(f)
-            res: Iterable[jsonpath_ng.DatumInContext] = self.jsonpath_expr.find(data)
-
-            if not len(res):
-                logger.error(f"Failed parsing file {filepath} with filter: {self.jsonpath_expr}")
-                continue
-
-            normalized_filename = blob_meta.normalized_filepath()
-            
-            if self.save_method == SaveMethod.AtomFilename:
-                # Use the atom's key as filename for saving locally
-                for a in res:
-                    local_filename = str(a.path)
-                    remote_filename = a.value
-                    local_filepath = download_dir.joinpath(normalized_filename, local_filename)
-                    logger.debug(f"Adding {remote_filename} -> {local_filepath} to queue")
+            for exc in raised_exceptions:
+                logger.error(f"Failed downloading metadata file, exception: {exc}")
+
+            logger.info(f"Downloaded {len(successfully_downloaded_metadata_files)} atom-metadata files (Failed: {len(raised_exceptions)})")
+
+            """
+            3. Download binaries (Actual atom binaries, filtered to grab only non-metadata ones)
+
+            NOTE: There are atoms for binary files and ones for timestamps and other metadata.
+                  We only care about the binary files, returned by the jsonpath-filter!
+            """
+            # Create a mapping of actual filepath and the blob's normalized filepath
+            filepath_map = list(zip(downloaded_metadata_files, normalized_filepaths))
+
+            # Filter out the ones that threw an exception when downloading
+            filepath_map = [(path, normalized) for (path, normalized) in filepath_map if isinstance(path, Path)]
+
+            #with open(blobs_filemapping, "wt") as f:
+            #    json.dump(f, filepath_map, indent=2)
+
+            # Assemble list of files to download / transform
+            to_download.clear()
+
+            # Parse the metadata files and apply the filter in worker threads, so the
+            # file reads and JSON decoding don't block the event loop. The files are tiny,
+            # so they're handed out in batches rather than as one thread task per file.
+            metadata_filepaths = [filepath for (filepath, _) in filepath_map]
+            found_atom_batches = await asyncio.gather(
+                *(asyncio.to_thread(self._find_atoms_batch, metadata_filepaths[i:i + FIND_ATOMS_BATCH_SIZE])
+                    for i in range(0, len(metadata_filepaths), FIND_ATOMS_BATCH_SIZE))
+            )
+            found_atoms = [res for batch in found_atom_batches for res in batch]
+
+            for (filepath, normalized_filename), res in zip(filepath_map, found_atoms):
+                if not len(res):
+                    logger.error(f"Failed parsing file {filepath} with filter: {self.jsonpath_expr}")
+                    continue
+
+                if self.save_method == SaveMethod.AtomFilename:
+                    # Use the atom's key as filename for saving locally
+                    for local_filename, remote_filename in res:
+                        local_filepath = download_dir.joinpath(normalized_filename, local_filename)
+                        logger.debug(f"Adding {remote_filename} -> {local_filepath} to queue")
+                        to_download.append((remote_filename, local_filepath))
+
+                elif self.save_method == SaveMethod.BlobFilename:
+                    # Use the fileName from BlobMetadata for saving locally
+                    if len(res) != 1:
+                        raise ValueError("Save-method 'BlobFilename' only expects a single remote filepath!")
+                    remote_filename = res[0][1]
+                    local_filepath = download_dir.joinpath(normalized_filename)
                     to_download.append((remote_filename, local_filepath))
-            
-            elif self.save_method == SaveMethod.BlobFilename:
-                # Use the fileName from BlobMetadata for saving locally
-                assert len(res) == 1, "Save-method 'BlobFilename' only expects a single remote filepath!"
-                remote_filename = res[0].value
-                local_filepath = download_dir.joinpath(normalized_filename)
-                to_download.append((remote_filename, local_filepath))
-            else:
-                raise Exception(f"Unhandled save-method: {self.save_method}")
-
-        downloaded_binary_files = await asyncio.gather(
-            *(self._download_blob_file(remote_filename, local_filepath)
-                for (remote_filename, local_filepath) in to_download),
-                return_exceptions=True
-        )
+                else:
+                    raise Exception(f"Unhandled save-method: {self.save_method}")
 
-        raised_exceptions = [x for x in downloaded_binary_files if isinstance(x, Exception)]
-        successfully_downloaded_bins = [x for x in downloaded_binary_files if isinstance(x, Path)]
+            downloaded_binary_files = await self._download_blob_files(to_download, zip_appender)
 
-        for exc in raised_exceptions:
-            logger.error(f"Failed downloading file, exception: {exc}")
+            raised_exceptions = [x for x in downloaded_binary_files if isinstance(x, Exception)]
+            successfully_downloaded_bins = [x for x in downloaded_binary_files if isinstance(x, Path)]
 
-        logger.info(f"Downloaded {len(successfully_downloaded_bins)} binary savedata files (Failed: {len(raised_exceptions)})")
+            for exc in raised_exceptions:
+                logger.error(f"Failed downloading file, exception: {exc}")
+
+            logger.info(f"Downloaded {len(successfully_downloaded_bins)} binary savedata files (Failed: {len(raised_exceptions)})")
 
         downloaded_files = successfully_downloaded_metadata_files
         downloaded_files.extend(successfully_downloaded_bins)
         downloaded_files.append(blobs_filepath)
 
-        """
-        Zip the files up 
-        """
-        with zipfile.ZipFile(zip_filepath, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for file_path in downloaded_files:
-                if file_path.exists():
-                    zf.write(file_path, file_path.relative_to(download_dir))
-
-        if zip_filepath.exists() and zip_filepath.stat().st_size > 0:
-            logger.info(f"Successfully downloaded a total of {len(downloaded_files)} files")
+        # The zip was just written above, so there's no need to stat it
+        logger.info(f"Successfully downloaded a total of {len(downloaded_files)} files")
 
         return (download_dir, zip_filepath)
 
@@ -265,49 +476,97 @@ class TitleStorageContext:
         """Clean up downloaded files and directories."""
         try:
             if download_dir.is_dir():
-                shutil.rmtree(download_dir)
+                # rmtree blocks; run it off the event loop
+                await asyncio.to_thread(shutil.rmtree, download_dir)
         except Exception as e:
             logger.warning(f"Error during cleanup: {e}")
 
 class XboxSaveManager:
-    def __init__(self, client_id: str, redirect_uri: str, tokens_file: str = "user_tokens.json", download_dir: str = "downloads"):
+    def __init__(
+        self,
+        client_id: str,
+        redirect_uri: str,
+        tokens_file: str = "user_tokens.json",
+        download_dir: str = "downloads",
+        games: Optional[GameMetadataCollection] = None,
+    ):
         self.client_id = client_id
         self.redirect_uri = redirect_uri
         self.tokens_file = tokens_file
         self.download_dir = Path(download_dir)
         # Tokens
         self.user_tokens_data = self.load_user_tokens(self.tokens_file)
-        self.games_meta = self.load_game_meta_dict("games.json")
+        self._tokens_write_lock = asyncio.Lock()
+        # Reuse the collection the caller already loaded, if any, instead of parsing games.json again
+        if games is None:
+            games = load_games_collection("games.json")
+        self.games_meta = self.game_meta_dict(games)
         # Gamefile transform functions
         self.jsonpath_exprs = self.load_jsonpath_filters(self.games_meta)
+        # One signed session per user (each user has their own signing key), kept open so
+        # token refreshes and downloads reuse its pooled connections. Closed by aclose().
+        self._sessions: Dict[str, SignedSession] = {}
+
+    async def __aenter__(self) -> "XboxSaveManager":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the sessions held for all users."""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            await session.aclose()
+
+    def _get_session(self, user_id: str, signing_key: str) -> SignedSession:
+        session = self._sessions.get(user_id)
+        if session is None or session.is_closed:
+            session = self._sessions[user_id] = SignedSession.from_pem_signing_key(signing_key)
+        return session
+
+    async def _drop_session(self, user_id: str) -> None:
+        session = self._sessions.pop(user_id, None)
+        if session is not None:
+            await session.aclose()
 
     @staticmethod
     def load_game_meta_dict(filepath: str) -> Dict[str, GameMetadata]:
-        res = load_games_collection(filepath)
+        return XboxSaveManager.game_meta_dict(load_games_collection(filepath))
+
+    @staticmethod
+    def game_meta_dict(collection: GameMetadataCollection) -> Dict[str, GameMetadata]:
         # Transform into a dict of PFN -> GameMetadata
-        return {metadata.pfn: metadata for (_, metadata) in res.root.items()}
+        return {metadata.pfn: metadata for (_, metadata) in collection.items()}
 
     @staticmethod
-    def load_jsonpath_filters(collection: GameMetadataCollection) -> Dict[str, jsonpath_ng.JSONPath]:
+    def load_jsonpath_filters(collection: Dict[str, GameMetadata]) -> Dict[str, jsonpath_ng.JSONPath]:
         res = {}
         for game_name, meta in collection.items():
             logger.debug(f"Importing jsonpath_filter for {game_name} ({meta.pfn})")
             # Prepare jsonpath expressions
-            res[meta.pfn] = jsonpath_ng.parse(meta.jsonpath_filter)
+            res[meta.pfn] = parse_jsonpath(meta.jsonpath_filter)
 
         return res
 
     @staticmethod
     def load_user_tokens(tokens_file: str) -> UserTokenData:
         """Load user tokens from the tokens file."""
-        if os.path.exists(tokens_file):
+        try:
+            st = os.stat(tokens_file)
+        except FileNotFoundError:
+            st = None
+        if st is not None:
             try:
-                with open(tokens_file, 'rt') as f:
-                    data = f.read()
-                    if not data:
-                        return UserTokenData({})
-                    res = UserTokenData.model_validate_json(data)
-                logger.info(f"Loaded {len(res.root.items())} user tokens.")
+                # Repeat loads of an unchanged file reuse the parsed tokens
+                cached = _load_user_tokens_cached(tokens_file, st.st_mtime_ns, st.st_size)
+                if cached is None:
+                    return UserTokenData({})
+                # Each manager adds and removes users in its own copy of the dict. The
+                # token entries themselves are only ever replaced, so they can be shared.
+                res = UserTokenData.model_construct(root=dict(cached.root))
+                logger.info(f"Loaded {len(res.root)} user tokens.")
                 return res
             except json.JSONDecodeError:
                 logger.error(f"Error decoding {tokens_file}. Starting empty.")
@@ -316,16 +575,45 @@ class XboxSaveManager:
             logger.info(f"{tokens_file} not found. Starting empty.")
             return UserTokenData({})
 
-    def save_user_tokens(self) -> None:
-        """Save user tokens to the tokens file."""
+    async def save_user_tokens_async(self) -> None:
+        """
+        Save user tokens to the tokens file. The tokens are serialized here (so they
+        can't change while being dumped), and written in a worker thread.
+        """
         try:
-            with open(self.tokens_file, 'wt') as f:
-                data = self.user_tokens_data.model_dump_json(indent=2)
-                f.write(data)
-            logger.info(f"Saved {len(self.user_tokens_data.root.items())} user tokens.")
+            # Serialized straight to bytes, without an intermediate str
+            data = _TOKENS_ADAPTER.dump_json(self.user_tokens_data, indent=2)
+            # One write at a time, so concurrent saves can't clobber each other's temp file
+            async with self._tokens_write_lock:
+                await asyncio.to_thread(self._write_tokens_file, self.tokens_file, data)
+            logger.info(f"Saved {len(self.user_tokens_data.root)} user tokens.")
         except Exception as e:
             logger.error(f"Error saving user tokens: {e}")
 
+    @staticmethod
+    def _write_tokens_file(tokens_file: str, data: bytes) -> None:
+        # Written to a temporary file first and then swapped in, so a crash part way
+        # through never leaves a truncated tokens file behind. The file holds refresh
+        # tokens and signing keys: mkstemp creates it readable by the owner only, and an
+        # existing file's mode is kept. A symlinked tokens file is written through, so
+        # the link stays a link.
+        real_path = os.path.realpath(tokens_file)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(real_path), prefix=os.path.basename(real_path) + ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            if os.path.exists(real_path):
+                shutil.copymode(real_path, tmp_path)
+            os.replace(tmp_path, real_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
     async def generate_auth_url(self) -> str:
         """Generate the Xbox Live authentication URL."""
         async with SignedSession() as session:
@@ -348,7 +636,9 @@ class XboxSaveManager:
 
                 token_data = self._convert_tokens_to_dict(auth_mgr)
                 self.user_tokens_data[user_id] = token_data
-                self.save_user_tokens()
+                await self.save_user_tokens_async()
+                # The user's signing key was replaced; a session with the old one is stale
+                await self._drop_session(user_id)
 
                 gamertag = auth_mgr.xsts_token.gamertag or f"User_{auth_mgr.xsts_token.xuid}"
                 logger.info(f"Authenticated user as {gamertag}")
@@ -383,31 +673,37 @@ class XboxSaveManager:
             return None
 
         token_info_dict = self.user_tokens_data[user_id]
-        session = SignedSession.from_pem_signing_key(token_info_dict.signing_key)
+        session = self._get_session(user_id, token_info_dict.signing_key)
         try:
             # Construct AuthenticationManager with previously saved values / tokens
             auth_mgr = AuthenticationManagerEx(session, self.client_id, None, self.redirect_uri, device_id=token_info_dict.device_id)
-            auth_mgr.oauth = OAuth2TokenResponse.model_validate(token_info_dict.oauth)
-            auth_mgr.device_token = XADResponse.model_validate(token_info_dict.device_token)
-            auth_mgr.user_token = XAUResponse.model_validate(token_info_dict.user_token)
-            auth_mgr.xsts_token = XSTSResponse.model_validate(token_info_dict.xsts_token)
+            # Already validated when the tokens file was loaded
+            auth_mgr.oauth = token_info_dict.oauth
+            auth_mgr.device_token = token_info_dict.device_token
+            auth_mgr.user_token = token_info_dict.user_token
+            auth_mgr.xsts_token = token_info_dict.xsts_token
 
-            await auth_mgr.refresh_tokens()
+            # Only tokens that are expired or close to it cost a request
+            refreshed = await auth_mgr.refresh_tokens(TOKEN_REFRESH_MARGIN)
 
             if not auth_mgr.xsts_token or not auth_mgr.xsts_token.xuid:
                 logger.warning(f"After refresh_tokens, XSTS/XUID still missing for {user_id}")
                 if user_id in self.user_tokens_data:
                     del self.user_tokens_data[user_id]
-                    self.save_user_tokens()
-                await session.aclose()
+                    await self.save_user_tokens_async()
+                await self._drop_session(user_id)
                 return None
 
+            if not refreshed:
+                logger.info(f"Stored tokens still valid for {user_id}. Gamertag: {auth_mgr.xsts_token.gamertag}")
+                return auth_mgr, session
+
             logger.info(f"Tokens refreshed for {user_id}. Gamertag: {auth_mgr.xsts_token.gamertag}")
 
             # Save refreshed tokens
             refreshed_token_data = self._convert_tokens_to_dict(auth_mgr)
             self.user_tokens_data[user_id] = refreshed_token_data
-            self.save_user_tokens()
+            await self.save_user_tokens_async()
 
             return auth_mgr, session
 
@@ -415,11 +711,31 @@ class XboxSaveManager:
             logger.error(f"Error in get_auth_manager_and_session for {user_id}: {e}")
             if user_id in self.user_tokens_data:
                 del self.user_tokens_data[user_id]
-                self.save_user_tokens()
-            await session.aclose()
+                await self.save_user_tokens_async()
+            await self._drop_session(user_id)
             # Re-raise exception
             raise
 
+    def has_valid_tokens(self, user_id: str) -> bool:
+        """Cheap in-memory check whether a user has a stored, still-valid XSTS token."""
+        token_data = self.user_tokens_data.root.get(user_id)
+        return bool(token_data and token_data.xsts_token and token_data.xsts_token.is_valid())
+
+    async def try_refresh_tokens(self, user_id: str) -> bool:
+        """
+        Silently refresh a user's stored tokens.
+        Returns False if there is nothing to refresh or refreshing failed (user must authenticate again).
+        """
+        if user_id not in self.user_tokens_data:
+            return False
+        try:
+            auth_session_tuple = await self.get_auth_manager_and_session(user_id)
+        except Exception:
+            # Already logged, and the stale tokens were dropped
+            return False
+        # The session stays open for the user's next requests
+        return auth_session_tuple is not None
+
     async def get_titlestorage_context(self, user_id: str, scid: str, pfn: str) -> TitleStorageContext:
         auth_session_tuple = await self.get_auth_manager_and_session(user_id)
         if not auth_session_tuple:
@@ -433,7 +749,7 @@ class XboxSaveManager:
         else:
             logger.warning("Using default values, as game was not configured via games.json")
             save_method = SaveMethod.AtomFilename
-            jsonpath_expr = jsonpath_ng.parse("atoms.*")
+            jsonpath_expr = parse_jsonpath("atoms.*")
 
         return TitleStorageContext(
             user_id=user_id,
@@ -6,14 +6,15 @@
 replace_craft.py
 
 Usage:
-    python replace_craft.py path/to/file_or_directory [--dry-run]
+    python replace_craft.py path/to/file_or_directory [--dry-run] [--jobs N]
 
 If the path is a file, it will be processed (must be a .craft file to be modified).
 If the path is a directory, every .craft file contained within that directory (recursively)
 will be processed.
 
 By default the script modifies files in place (atomic replace). Use --dry-run to see what
-would change without writing any files.
+would change without writing any files. Files are processed in parallel worker processes;
+use --jobs 1 to process them one at a time.
 
 Selective search-and-replace mappings:
   externalTankCapsule.v2 -> externalTankCapsule
@@ -33,9 +34,17 @@ Examples:
   python replace_craft.py ./crafts_dir --dry-run
 """
 
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import List, Optional, Tuple
 import argparse
+import io
+import mmap
+import os
+import re
 import sys
 import tempfile
 
@@ -58,76 +67,74 @@ MAPPINGS.sort(key=lambda x: len(x[0]), reverse=True)
 SEARCH_TERMS = [m[0] for m in MAPPINGS]
 REPLACEMENTS = {m[0]: m[1] for m in MAPPINGS}
 
+# Single alternation of all search terms (longest first, so the longest term wins)
+PATTERN = re.compile("|".join(re.escape(t) for t in SEARCH_TERMS))
 
-def should_replace_at(original_line: str, match_pos: int) -> bool:
-    """Return True if any prefix appears somewhere in original_line before match_pos."""
-    for p in PREFIXES:
-        if original_line.rfind(p, 0, match_pos) != -1:
-            return True
-    return False
+# Every search term ends in one of these; a line containing none of them can't match
+DISCRIMINATORS = (".v2", ".old")
+DISCRIMINATOR_BYTES = tuple(d.encode("utf-8") for d in DISCRIMINATORS)
 
+# Line boundaries str.splitlines() honours besides "\n" ("\r" is already translated away on
+# read). Rare in .craft files, so they're only looked for when the text contains one.
+OTHER_LINE_BREAKS = ("\r", "\v", "\f", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
 
-def process_line(original_line: str) -> Tuple[str, Dict[str, int]]:
+# Files at least this big are prefiltered through a memory map instead of being read up front
+MMAP_THRESHOLD = 1024 * 1024
+
+
+def process_text(text: str) -> Tuple[str, Counter]:
     """
-    Process a single line, replacing matches when the rule is satisfied.
-    Returns the new line and a dict of replacement counts for this line.
+    Process a whole file's text in a single regex pass, replacing matches when the rule
+    is satisfied (a prefix appears earlier on the same line). Lines end wherever
+    str.splitlines() would end them, not only at "\n".
+    Returns the new text and a Counter of replacements per search term.
     """
-    out_chars: List[str] = []
-    i = 0
-    n = len(original_line)
-    counts: Dict[str, int] = {k: 0 for k in SEARCH_TERMS}
-
-    while i < n:
-        matched = False
-        # Try each search term (ordered by length desc)
-        for term in SEARCH_TERMS:
-            term_len = len(term)
-            if i + term_len <= n and original_line.startswith(term, i):
-                if should_replace_at(original_line, i):
-                    out_chars.append(REPLACEMENTS[term])
-                    counts[term] += 1
-                    i += term_len
-                    matched = True
-                    break
-                else:
-                    # Do not replace here; allow fallback to append a single character
-                    matched = False
-                    # continue trying other (shorter) terms in case of overlap
-        if not matched:
-            out_chars.append(original_line[i])
-            i += 1
-
-    return "".join(out_chars), counts
-
-
-def process_lines(lines: List[str]) -> Tuple[List[Tuple[int, str, str, Dict[str, int]]], Dict[str, int]]:
+    totals: Counter = Counter()
+    other_breaks = [c for c in OTHER_LINE_BREAKS if c in text]
+
+    def repl(m: re.Match) -> str:
+        term = m.group(0)
+        pos = m.start()
+        line_start = text.rfind("\n", 0, pos) + 1
+        if other_breaks:
+            # Only the stretch since the last "\n" needs searching
+            line_start = max(line_start, *(text.rfind(c, line_start, pos) + 1 for c in other_breaks))
+        # str.find with an end bound only finds a prefix that ends before the match
+        if any(text.find(p, line_start, pos) != -1 for p in PREFIXES):
+            totals[term] += 1
+            return REPLACEMENTS[term]
+        return term
+
+    return PATTERN.sub(repl, text), totals
+
+
+def changed_lines(original_text: str, new_text: str) -> List[Tuple[int, str, str]]:
     """
-    Process list of lines.
-    Returns:
-      - changes: list of tuples (line_no (1-based), original_line, new_line, counts)
-      - totals: dict of totals per search term
+    Compare original and processed text line by line (replacements never add or remove lines).
+    Returns a list of tuples (line_no (1-based), original_line, new_line) for lines that differ.
     """
-    changes = []
-    totals: Dict[str, int] = {k: 0 for k in SEARCH_TERMS}
-    for idx, line in enumerate(lines, start=1):
-        new_line, counts = process_line(line)
-        if new_line != line:
-            changes.append((idx, line, new_line, counts))
-        for k, v in counts.items():
-            totals[k] += v
-    return changes, totals
+    pairs = zip(original_text.splitlines(keepends=True), new_text.splitlines(keepends=True))
+    return [(idx, orig, new) for idx, (orig, new) in enumerate(pairs, start=1) if orig != new]
 
 
 def write_in_place(input_path: Path, out_text: str) -> None:
     """
     Atomically overwrite input_path with out_text by writing to a temp file in the same directory and replacing.
+    The encoded text goes straight to the raw file descriptor, bypassing the buffered/text IO layers.
     """
     dirpath = input_path.parent
-    with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=str(dirpath), prefix=".tmp_replace_craft_") as tf:
-        tf_name = Path(tf.name)
-        tf.write(out_text)
+    # Keep the newline translation a text-mode write would have done
+    if os.linesep != "\n":
+        out_text = out_text.replace("\n", os.linesep)
+    data = memoryview(out_text.encode("utf-8"))
+    fd, tf_name = tempfile.mkstemp(dir=str(dirpath), prefix=".tmp_replace_craft_")
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
     # Atomic replace
-    tf_name.replace(input_path)
+    os.replace(tf_name, input_path)
 
 
 def find_craft_files(path: Path) -> List[Path]:
@@ -144,25 +151,50 @@ def find_craft_files(path: Path) -> List[Path]:
     return files
 
 
-def process_file(path: Path, dry_run: bool) -> Tuple[int, Dict[str, int]]:
+def read_candidate_bytes(path: Path) -> Optional[bytes]:
+    """
+    Return the contents of path if it contains any discriminator, otherwise None.
+    Large files are checked through a read-only memory map, so files that can't match
+    are never copied into memory.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            raw = f.read()
+            return raw if any(d in raw for d in DISCRIMINATOR_BYTES) else None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if all(mm.find(d) == -1 for d in DISCRIMINATOR_BYTES):
+                return None
+            return mm[:]
+
+
+def process_file(path: Path, dry_run: bool) -> Tuple[int, Counter]:
     """
     Process a single .craft file.
     Returns (replacements_made_count, totals_per_term)
     If dry_run is True, file is not written.
     """
-    text = path.read_text(encoding="utf-8")
-    lines = text.splitlines(keepends=True)
-    changes, totals = process_lines(lines)
+    raw = read_candidate_bytes(path)
+    if raw is None:
+        # Fast path: no search term occurs anywhere in the file, skip decoding entirely
+        text = final_text = ""
+        totals = Counter()
+    else:
+        text = raw.decode("utf-8")
+        if "\r" in text:
+            # Same universal-newline translation read_text() would have done
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        final_text, totals = process_text(text)
     total_replacements = sum(totals.values())
 
     if dry_run:
         if total_replacements:
             print(f"\n[DRY RUN] {path} - {total_replacements} replacement(s) would be made:")
-            for term, count in totals.items():
+            for term in SEARCH_TERMS:
+                count = totals[term]
                 if count:
                     print(f"  {term} -> {REPLACEMENTS[term]} : {count}")
             print("  Changed lines:")
-            for line_no, orig, new, counts in changes:
+            for line_no, orig, new in changed_lines(text, final_text):
                 orig_display = orig.rstrip("\r\n")
                 new_display = new.rstrip("\r\n")
                 print(f"    {line_no}:")
@@ -177,13 +209,6 @@ def process_file(path: Path, dry_run: bool) -> Tuple[int, Dict[str, int]]:
         print(f"{path} - no replacements. File left unchanged.")
         return 0, totals
 
-    # Build final text
-    processed_lines = []
-    for line in lines:
-        new_line, _ = process_line(line)
-        processed_lines.append(new_line)
-    final_text = "".join(processed_lines)
-
     try:
         write_in_place(path, final_text)
     except Exception as exc:
@@ -194,10 +219,34 @@ def process_file(path: Path, dry_run: bool) -> Tuple[int, Dict[str, int]]:
     return total_replacements, totals
 
 
+def process_file_captured(path: Path, dry_run: bool) -> Tuple[str, str, Tuple[int, Counter]]:
+    """
+    Run process_file in a worker process, capturing what it prints so the parent can
+    replay it in file order.
+    Returns (stdout_text, stderr_text, process_file_result)
+    """
+    out, err = io.StringIO(), io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        result = process_file(path, dry_run)
+    return out.getvalue(), err.getvalue(), result
+
+
+def positive_int(value: str) -> int:
+    """argparse type for --jobs: a whole number of at least 1."""
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
+
 def main(argv):
     ap = argparse.ArgumentParser(description="Selective search-and-replace for .craft files (file or directory).")
     ap.add_argument("path", help="Path to a .craft file or a directory containing .craft files (recursive)")
     ap.add_argument("--dry-run", action="store_true", help="Show changes that would be made, do not write to files")
+    ap.add_argument("--jobs", type=positive_int, default=None, help="Number of worker processes (default: CPU count)")
     args = ap.parse_args(argv)
 
     input_path = Path(args.path)
@@ -213,16 +262,28 @@ def main(argv):
         print(f"No .craft files found under '{input_path}'.")
         return 0
 
-    overall_totals: Dict[str, int] = {k: 0 for k in SEARCH_TERMS}
+    overall_totals: Counter = Counter()
     files_processed = 0
     total_replacements_all = 0
 
-    for cf in sorted(craft_files):
+    craft_files = sorted(craft_files)
+    if len(craft_files) == 1 or args.jobs == 1:
+        results = [process_file(cf, args.dry_run) for cf in craft_files]
+    else:
+        # Files are independent, so fan them out across processes. Output is
+        # replayed here in sorted order so it reads the same as a serial run.
+        results = []
+        worker = partial(process_file_captured, dry_run=args.dry_run)
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            for out, err, result in executor.map(worker, craft_files, chunksize=8):
+                sys.stdout.write(out)
+                sys.stderr.write(err)
+                results.append(result)
+
+    for replacements, totals in results:
         files_processed += 1
-        replacements, totals = process_file(cf, args.dry_run)
         total_replacements_all += replacements
-        for k, v in totals.items():
-            overall_totals[k] += v
+        overall_totals.update(totals)
 
     # Summary
     print("\nSummary:")
@@ -231,7 +292,8 @@ def main(argv):
     print(f"  Total replacements: {total_replacements_all}")
     if total_replacements_all:
         print("  Breakdown by term:")
-        for term, count in overall_totals.items():
+        for term in SEARCH_TERMS:
+            count = overall_totals[term]
             if count:
                 print(f"    {term} -> {REPLACEMENTS[term]} : {count}")
 
@@ -9,6 +9,8 @@ If a directory is provided, it will recursively run the extractor on every
 regular file under that directory. For each input file, a corresponding output
 subfolder is created inside the user-provided output directory using the input
 file's name. Extracted files from that input file go into that subfolder.
+Files in a directory are extracted in parallel worker processes; use --jobs 1
+to extract them one at a time.
 
 NOTE: It was originally designed to work with the --dry parameter, but I asked an AI to change it to --dry-run to keep it consistent with the other programs. It said it preserved the variable names though, so thats why it might look a little weird. -Task_Metadata (on github)
 """
@@ -17,94 +19,206 @@ import os
 import argparse
 import pathlib
 import struct
+import sys
+import traceback
 import lzma
+import mmap
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from functools import partial
+from typing import Iterator, Optional, Set, Tuple, Union
 
-from dissect import cstruct
-
-TYPES = cstruct.cstruct()
-TYPES.load("""
-struct KSP_BLOB_ENTRY {
-  UINT EntryLen;
-  BYTE Padding;
-  BYTE FilenameLen;
-  BYTE Padding2;
-  BYTE LastFileMarker;
-  CHAR Filename[FilenameLen];
-  BYTE Data[EntryLen];
-};
-""")
+# Layout of each entry in a blob:
+#
+# struct KSP_BLOB_ENTRY {
+#   UINT EntryLen;
+#   BYTE Padding;
+#   BYTE FilenameLen;
+#   BYTE Padding2;
+#   BYTE LastFileMarker;
+#   CHAR Filename[FilenameLen];
+#   BYTE Data[EntryLen];
+# };
+#
+# Only the fixed-size header is unpacked; Filename and Data are sliced out directly.
+KSP_BLOB_ENTRY_HEADER = struct.Struct("<IBBBB")
 
 def read_u32(data: bytes, offset: int) -> int:
-    return struct.unpack("<I", data[offset:offset+4])[0]
+    return struct.unpack_from("<I", data, offset)[0]
 
-def decompress(data: bytes) -> bytes:
+def slice_exact(blob: memoryview, offset: int, length: int) -> memoryview:
+    data = blob[offset:offset+length]
+    if len(data) != length:
+        raise EOFError(f"Read {len(data)} bytes, but expected {length}")
+    return data
+
+# Input files at least this big are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# Upper bound on how much decompressed data is held in memory at once
+DECOMPRESS_CHUNK_SIZE = 1024 * 1024
+
+def decompress_to(outputfile: io.BufferedWriter, data: bytes) -> int:
+    """
+    Decompress `data` into `outputfile` in chunks of at most DECOMPRESS_CHUNK_SIZE,
+    so peak memory doesn't grow with the uncompressed size. Returns the number of
+    bytes written.
+    """
     context = lzma.LZMADecompressor(
         format=lzma.FORMAT_RAW,
         filters=[
             {"id": lzma.FILTER_LZMA1},
         ]
     )
-    return context.decompress(data)
+    written = 0
+    chunk = context.decompress(data, max_length=DECOMPRESS_CHUNK_SIZE)
+    while True:
+        outputfile.write(chunk)
+        written += len(chunk)
+        if context.eof or context.needs_input:
+            return written
+        chunk = context.decompress(b"", max_length=DECOMPRESS_CHUNK_SIZE)
 
-def extract_file(inputfile: io.BufferedReader, outputdir: pathlib.Path, dryrun: bool) -> None:
+def extract_file(blob: Union[bytes, mmap.mmap], outputdir: pathlib.Path, dryrun: bool) -> None:
     """
-    Extract all entries from the file-like `inputfile` into the `outputdir` root.
+    Extract all entries from `blob` (the whole input file's contents) into the `outputdir` root.
     `outputdir` is the root directory for this single input file's extractions
     (i.e. outputdir/<extracted paths>).
     """
-    inputfile.seek(0, os.SEEK_END)
-    total_filesize = inputfile.tell()
-    inputfile.seek(0, os.SEEK_SET)
+    view = memoryview(blob)
+    total_filesize = len(view)
+    offset = 0
 
+    created_dirs: Set[pathlib.Path] = set()
     while True:
-        parsed = TYPES.KSP_BLOB_ENTRY(inputfile)
+        # The header is unpacked by a precompiled struct; the filename and payload are
+        # zero-copy slices of the in-memory blob
+        header = slice_exact(view, offset, KSP_BLOB_ENTRY_HEADER.size)
+        entry_len, _, filename_len, _, last_file_marker = KSP_BLOB_ENTRY_HEADER.unpack(header)
+        offset += KSP_BLOB_ENTRY_HEADER.size
+        raw_filename = bytes(slice_exact(view, offset, filename_len))
+        offset += filename_len
+        payload_offset = offset
+        offset += entry_len
 
         # Did we reach EOF yet?
-        if parsed.LastFileMarker:
-            assert parsed.Filename == b""
-            assert inputfile.tell() == total_filesize
+        if last_file_marker:
+            assert raw_filename == b""
+            assert offset == total_filesize
             break
 
-        # Strip leading "\" of filename and null terminator
-        filename = parsed.Filename.decode('utf-8').strip()[1:-1]
+        # Strip leading "\" of filename and null terminator, and the ".cmp" marker,
+        # on the raw bytes; only the final name gets decoded
+        raw_filename = raw_filename.strip()[1:-1]
 
-        compressed = False
-        if filename.endswith(".cmp"):
-            compressed = True
-            filename = filename[:-4]
+        compressed = raw_filename.endswith(b".cmp")
+        if compressed:
+            raw_filename = raw_filename[:-4]
+        filename = raw_filename.decode('utf-8')
 
         target_filepath = outputdir.joinpath(pathlib.PureWindowsPath(filename))
 
-        if not target_filepath.parent.exists() and not dryrun:
-            target_filepath.parent.mkdir(parents=True, exist_ok=True)
-        
-        if not dryrun:
-            compressed_data = parsed.Data.dumps()
+        # Entries are grouped in a few folders, so only mkdir each parent once
+        parent = target_filepath.parent
+        if not dryrun and parent not in created_dirs:
+            parent.mkdir(parents=True, exist_ok=True)
+            created_dirs.add(parent)
 
-            if compressed:
-                compressed_length = len(compressed_data)
-                uncompressed_length = read_u32(compressed_data, 5)
+        if not dryrun:
+            compressed_data = slice_exact(view, payload_offset, entry_len)
 
-                print(f"{target_filepath} ({compressed_length=:X} {uncompressed_length=:X})")
+            with io.open(target_filepath, "wb") as f:
+                if compressed:
+                    compressed_length = len(compressed_data)
+                    uncompressed_length = read_u32(compressed_data, 5)
 
-                without_header = compressed_data[9:]
-                data = decompress(without_header)
+                    print(f"{target_filepath} ({compressed_length=:X} {uncompressed_length=:X})")
 
-                assert len(data) == uncompressed_length, "Mismatch of decompressed data size"
-            else:
-                data = compressed_data
+                    without_header = compressed_data[9:]
+                    written = decompress_to(f, without_header)
 
-            with io.open(target_filepath, "wb") as f:
-                f.write(data)
+                    assert written == uncompressed_length, "Mismatch of decompressed data size"
+                else:
+                    f.write(compressed_data)
         else:
             # In dry-run show where the file would be extracted
             print(target_filepath)
 
+def extract_path(inputfile: pathlib.Path, outputroot: pathlib.Path, dryrun: bool) -> None:
+    """
+    Extract a single input file into an output subfolder named after it (outputroot/<input name>).
+    """
+    out_subdir = outputroot / inputfile.name
+    if not dryrun:
+        out_subdir.mkdir(parents=True, exist_ok=True)
+    print(f"Processing file: {inputfile} -> {out_subdir}")
+    # Parse the whole blob in memory rather than with many small reads per entry. Large
+    # blobs are memory-mapped so pages are read on demand instead of copied up front.
+    with inputfile.open("rb") as fh:
+        if os.fstat(fh.fileno()).st_size >= MMAP_THRESHOLD:
+            # Deliberately not closed with `with`: if extraction fails, slices held by the
+            # traceback would make close() raise BufferError and hide the real error.
+            # The mapping is released once `blob` is dropped.
+            blob = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            blob = fh.read()
+    extract_file(blob, out_subdir, dryrun)
+
+def iter_input_files(root: pathlib.Path, skip_dir: Optional[pathlib.Path] = None) -> Iterator[pathlib.Path]:
+    """
+    Yield every regular file under `root` (recursively) as the walk proceeds, using
+    os.scandir so file types come from the directory listing instead of extra stats.
+    `skip_dir` (e.g. the output root, if it lives inside the input) is not descended into,
+    so files extracted while the walk is still running aren't picked up as inputs.
+    Directories that can't be listed are skipped, as rglob does.
+    """
+    subdirs = []
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            if entry.is_file():
+                yield pathlib.Path(entry.path)
+            elif entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+    for subdir in subdirs:
+        if skip_dir is not None and os.path.abspath(subdir) == str(skip_dir):
+            continue
+        yield from iter_input_files(subdir, skip_dir)
+
+def extract_path_captured(inputfile: pathlib.Path, outputroot: pathlib.Path, dryrun: bool) -> Tuple[str, Optional[Exception], Optional[str]]:
+    """
+    Run extract_path in a worker process, capturing its output so the parent can print it
+    in input order. Any exception is handed back (instead of raised), together with its
+    formatted traceback, so neither the output leading up to it nor where it happened is lost.
+    """
+    out = io.StringIO()
+    try:
+        with redirect_stdout(out):
+            extract_path(inputfile, outputroot, dryrun)
+    except Exception as exc:
+        return out.getvalue(), exc, traceback.format_exc()
+    return out.getvalue(), None, None
+
+def positive_int(value: str) -> int:
+    """argparse type for --jobs: a whole number of at least 1."""
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
 def main() -> None:
     parser = argparse.ArgumentParser("KSP Savegame blob extractor")
     parser.add_argument("inputpath", help="Input file or directory", type=pathlib.Path)
     parser.add_argument("outputdir", help="Output directory root", type=pathlib.Path)
     parser.add_argument("--dry-run", dest="dry", action="store_true", help="Dry-Run (no extraction, no folder/file creation)")
+    parser.add_argument("--jobs", type=positive_int, default=None, help="Number of worker processes for directory input (default: CPU count)")
     args = parser.parse_args()
 
     inputpath: pathlib.Path = args.inputpath
@@ -117,24 +231,35 @@ def main() -> None:
 
     if inputpath.is_file():
         # Single file: create an output subfolder named after the input file
-        out_subdir = outputroot / inputpath.name
-        if not dry:
-            out_subdir.mkdir(parents=True, exist_ok=True)
-        with inputpath.open("rb") as fh:
-            print(f"Processing file: {inputpath} -> {out_subdir}")
-            extract_file(fh, out_subdir, dry)
+        extract_path(inputpath, outputroot, dry)
     elif inputpath.is_dir():
-        # Directory: process all files recursively
-        files = list(inputpath.rglob("*"))
-        for f in files:
-            if not f.is_file():
-                continue
-            out_subdir = outputroot / f.name
-            if not dry:
-                out_subdir.mkdir(parents=True, exist_ok=True)
-            with f.open("rb") as fh:
-                print(f"Processing file: {f} -> {out_subdir}")
-                extract_file(fh, out_subdir, dry)
+        # Directory: process all files recursively. Each input file is independent
+        # (LZMA decompression is CPU-bound), so extract them in parallel processes.
+        files = iter_input_files(inputpath, skip_dir=pathlib.Path(os.path.abspath(outputroot)))
+        if args.jobs == 1:
+            for f in files:
+                extract_path(f, outputroot, dry)
+            return
+        # Inputs sharing a file name extract into the same output subfolder, so they must
+        # not run at the same time. Those are extracted one after the other (in walk
+        # order, so the last one still wins) once the parallel batch is done.
+        files = list(files)
+        name_counts = Counter(f.name for f in files)
+        serial = [f for f in files if name_counts[f.name] > 1]
+        parallel = [f for f in files if name_counts[f.name] == 1]
+        worker = partial(extract_path_captured, outputroot=outputroot, dryrun=dry)
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            for output, exc, tb in executor.map(worker, parallel):
+                print(output, end="")
+                if exc is not None:
+                    # The worker returned the exception instead of raising it, so it
+                    # carries no traceback from the worker; print the one captured there
+                    print(tb, end="", file=sys.stderr)
+                    # Stop on the first error instead of extracting the files still queued
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise exc
+        for f in serial:
+            extract_path(f, outputroot, dry)
     else:
         raise SystemExit(f"Input path '{inputpath}' does not exist or is not a file/directory")
 
@@ -18,13 +18,32 @@ level up) folder is named "common" (case-insensitive). It no longer skips
 when the immediate parent folder is named "common".
 """
 
+import errno
 import os
 import re
 import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Set
 
 _INVALID_WINDOWS_CHARS = r'<>:"/\\|?*\0'
 _CONTROL_CHARS = ''.join(chr(i) for i in range(0, 32))
+# Single str.translate table: control chars are deleted, invalid windows chars become '_'
+_SANITIZE_TABLE = dict.fromkeys(map(ord, _CONTROL_CHARS), None)
+_SANITIZE_TABLE.update({ord(ch): '_' for ch in _INVALID_WINDOWS_CHARS})
+
+_COMMENT_SPLIT_RE = re.compile(r'\s+#\s*|//')
+_WS_COLLAPSE_RE = re.compile(r'\s+')
+# Searched over a whole file's text, so the whitespace around '=' must not span lines
+_DISPLAY_NAME_RE = re.compile(r'\bdisplayName[^\S\n]*=[^\S\n]*(.+)', re.IGNORECASE)
+_DISPLAY_NAME_RE_BYTES = re.compile(rb'\bdisplayName[^\S\r\n]*=[^\S\r\n]*([^\r\n]+)', re.IGNORECASE)
+
+# displayName is normally near the top of metadata.txt, so only this much is scanned
+# as raw bytes before falling back to decoding the whole file
+_HEAD_CHUNK_SIZE = 64 * 1024
+
+# Threads used to read displayName from the metadata files (the reads are I/O bound)
+_READ_WORKERS = 16
 
 
 def sanitize_name(name: str) -> str:
@@ -37,54 +56,110 @@ def sanitize_name(name: str) -> str:
     # remove trailing semicolons or commas
     name = name.rstrip(';,')
     # remove inline comments if present
-    name = re.split(r'\s+#\s*|//', name, maxsplit=1)[0].strip()
-    # remove control chars
-    for ch in _CONTROL_CHARS:
-        name = name.replace(ch, '')
-    # replace invalid windows chars
-    for ch in _INVALID_WINDOWS_CHARS:
-        name = name.replace(ch, '_')
-    name = re.sub(r'\s+', ' ', name).strip()
+    name = _COMMENT_SPLIT_RE.split(name, maxsplit=1)[0].strip()
+    # remove control chars and replace invalid windows chars
+    name = name.translate(_SANITIZE_TABLE)
+    name = _WS_COLLAPSE_RE.sub(' ', name).strip()
     if not name:
         return "renamed_folder"
     return name
 
 
+def _clean_display_value(value: str) -> str:
+    value = value.strip()
+    # cut trailing inline comments
+    value = _COMMENT_SPLIT_RE.split(value, maxsplit=1)[0].strip()
+    return value.rstrip(';').strip()
+
+
 def find_display_name_in_file(path: str) -> str:
-    pattern = re.compile(r'\bdisplayName\s*=\s*(.+)', re.IGNORECASE)
     try:
+        # Fast path: scan the head of the file as bytes and decode only the matched value
+        with open(path, 'rb') as f:
+            head = f.read(_HEAD_CHUNK_SIZE)
+            m = _DISPLAY_NAME_RE_BYTES.search(head)
+            # A match running up to the end of a partial chunk may have its value cut off
+            if m and (m.end() < len(head) or len(head) < _HEAD_CHUNK_SIZE):
+                return _clean_display_value(m.group(1).decode('utf-8', 'replace'))
+            if len(head) < _HEAD_CHUNK_SIZE:
+                return ''
         with open(path, 'r', encoding='utf-8', errors='replace') as f:
-            for line in f:
-                m = pattern.search(line)
-                if m:
-                    value = m.group(1).strip()
-                    # cut trailing inline comments
-                    value = re.split(r'\s+#\s*|//', value, maxsplit=1)[0].strip()
-                    return value.rstrip(';').strip()
+            # One search over the whole text instead of a line object per iteration
+            m = _DISPLAY_NAME_RE.search(f.read())
+            if m:
+                return _clean_display_value(m.group(1))
     except Exception:
         return ''
     return ''
 
 
-def unique_target_path(base_parent: str, desired_name: str) -> str:
-    candidate = os.path.join(base_parent, desired_name)
-    if not os.path.exists(candidate):
-        return candidate
+def list_dir_names(path: str) -> Set[str]:
+    """
+    Return the (normcased) names in directory `path`, from a single os.scandir call.
+    "." and ".." are included, since os.path.exists reports them as existing too.
+    """
+    names = {'.', '..'}
+    with os.scandir(path) as it:
+        for entry in it:
+            names.add(os.path.normcase(entry.name))
+    return names
+
+
+def is_free_name(base_parent: str, name: str, existing: Set[str]) -> bool:
+    """
+    Check `name` against `existing` (as returned by list_dir_names) first, so taken
+    names cost no stat. A name that isn't listed is still confirmed on disk, since
+    normcase doesn't fold case on case-insensitive file systems such as macOS's default.
+    """
+    return os.path.normcase(name) not in existing and not os.path.lexists(os.path.join(base_parent, name))
+
+
+def unique_target_path(base_parent: str, desired_name: str, existing: Set[str]) -> str:
+    """Pick a free name in base_parent: desired_name, or desired_name with a " (n)" suffix."""
+    if is_free_name(base_parent, desired_name, existing):
+        return os.path.join(base_parent, desired_name)
     n = 1
     while True:
-        candidate_with_suffix = os.path.join(base_parent, f"{desired_name} ({n})")
-        if not os.path.exists(candidate_with_suffix):
-            return candidate_with_suffix
+        name_with_suffix = f"{desired_name} ({n})"
+        if is_free_name(base_parent, name_with_suffix, existing):
+            return os.path.join(base_parent, name_with_suffix)
         n += 1
 
 
+def iter_files(root: str):
+    """
+    Yield an os.DirEntry for every file under root (recursively), in the same
+    order os.walk would list them. Uses os.scandir directly so file types come
+    from the directory listing instead of a stat per entry. As with os.walk,
+    symlinks to files are yielded and symlinks to directories aren't descended into,
+    and directories that can't be listed are skipped.
+    The same helper lives in sfs-parts-renamer.py and savegame-folder-renamer.py (each
+    script runs standalone); keep the two copies identical.
+    """
+    stack = [root]
+    while stack:
+        subdirs = []
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif not (entry.is_symlink() and entry.is_dir()):
+                    yield entry
+        # Reversed so the first subdirectory is popped (and walked) first
+        stack.extend(reversed(subdirs))
+
+
+def is_metadata_file(name: str) -> bool:
+    # Exact match first; only names of the right length are worth lowercasing
+    return name == "metadata.txt" or (len(name) == 12 and name.lower() == "metadata.txt")
+
+
 def collect_metadata_files(root: str):
-    found = []
-    for dirpath, _, filenames in os.walk(root):
-        for fn in filenames:
-            if fn.lower() == "metadata.txt":
-                found.append(os.path.join(dirpath, fn))
-    return found
+    return [entry.path for entry in iter_files(root) if is_metadata_file(entry.name)]
 
 
 def main():
@@ -115,11 +190,22 @@ def main():
         sys.exit(0)
 
     # Sort by depth (deepest first) so we rename inner folders before ancestors,
-    # avoiding the "rename ancestor before descendant" problem.
-    metadata_files.sort(
-        key=lambda p: os.path.relpath(os.path.dirname(p), root).count(os.sep),
-        reverse=True
-    )
+    # avoiding the "rename ancestor before descendant" problem. Every path starts with
+    # the absolute root, so its separator count is its depth plus a constant.
+    # The sort is stable and the walk is depth-first, so within each depth all folders
+    # that share a parent directory stay next to each other: renames into the same
+    # directory run back to back, without an explicit grouping pass.
+    metadata_files.sort(key=lambda p: p.count(os.sep), reverse=True)
+
+    # Read every displayName up front, overlapping the file reads in a thread pool.
+    # This happens before any folder is renamed, so every metadata path is still valid.
+    # The renames themselves stay serial, since their order matters.
+    with ThreadPoolExecutor(max_workers=_READ_WORKERS) as executor:
+        display_names = list(executor.map(find_display_name_in_file, metadata_files))
+
+    # Directory listings of the folders being renamed into, so collision checks are set
+    # lookups rather than a stat per candidate. Kept up to date as folders are renamed.
+    dir_listings: Dict[str, Set[str]] = {}
 
     renamed = 0
     planned = 0
@@ -127,14 +213,15 @@ def main():
     skipped_common_grandparent = 0
     failed = []
 
-    for meta_path in metadata_files:
+    for meta_path, raw_value in zip(metadata_files, display_names):
         try:
-            parent_dir = os.path.abspath(os.path.dirname(meta_path))
+            # meta_path comes from walking the absolute root, so it's already absolute
+            parent_dir = os.path.dirname(meta_path)
             parent_basename = os.path.basename(parent_dir)
 
             # Grandparent (2nd level up)
             grandparent_dir = os.path.dirname(parent_dir)
-            grandparent_basename = os.path.basename(grandparent_dir) if grandparent_dir else ''
+            grandparent_basename = os.path.basename(grandparent_dir)
 
             # Skip only if grandparent is named "common" (case-insensitive).
             if grandparent_basename.lower() == "common":
@@ -143,7 +230,6 @@ def main():
                 skipped_common_grandparent += 1
                 continue
 
-            raw_value = find_display_name_in_file(meta_path)
             if not raw_value:
                 print(f"[SKIP] No displayName in: {meta_path}")
                 skipped += 1
@@ -151,25 +237,38 @@ def main():
 
             cleaned = sanitize_name(raw_value)
             current_name = parent_basename
-            parent_of_parent = os.path.dirname(parent_dir) or os.path.abspath(os.sep)
+            parent_of_parent = grandparent_dir
 
             if current_name == cleaned:
                 print(f"[SKIP] Already named: {parent_dir} -> {cleaned!r}")
                 skipped += 1
                 continue
 
-            target_path = os.path.join(parent_of_parent, cleaned)
-            if os.path.exists(target_path):
-                final_target = unique_target_path(parent_of_parent, cleaned)
+            existing = dir_listings.get(parent_of_parent)
+            if existing is None:
+                existing = dir_listings[parent_of_parent] = list_dir_names(parent_of_parent)
+
+            final_target = unique_target_path(parent_of_parent, cleaned, existing)
+            if os.path.basename(final_target) != cleaned:
                 print(f"[INFO] Desired name exists. Using unique: {final_target}")
-            else:
-                final_target = target_path
 
             if dry_run:
                 print(f"[DRY-RUN] Would rename: {parent_dir} -> {final_target}")
                 planned += 1
             else:
-                os.rename(parent_dir, final_target)
+                try:
+                    os.rename(parent_dir, final_target)
+                except OSError as exc:
+                    if exc.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                        raise
+                    # Something created the name after the directory was listed. Nothing
+                    # was stat-ed up front, so recover here: relist and pick a free name.
+                    existing = dir_listings[parent_of_parent] = list_dir_names(parent_of_parent)
+                    final_target = unique_target_path(parent_of_parent, cleaned, existing)
+                    print(f"[INFO] Desired name exists. Using unique: {final_target}")
+                    os.rename(parent_dir, final_target)
+                existing.discard(os.path.normcase(current_name))
+                existing.add(os.path.normcase(os.path.basename(final_target)))
                 print(f"[RENAMED] {parent_dir} -> {final_target}")
                 renamed += 1
 
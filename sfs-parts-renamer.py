@@ -8,6 +8,7 @@ replace_sfs.py
 Usage:
   replace_sfs.py INPUT_PATH         # INPUT_PATH may be a .sfs file or a directory
   replace_sfs.py --dry-run INPUT_PATH
+  replace_sfs.py --jobs N INPUT_PATH
 
 This script performs targeted search-and-replace operations only when the
 token to replace is directly preceded by the literal "name = " or "rTrf = "
@@ -24,16 +25,27 @@ Replacements (left -> right):
   linearRcs.old          -> linearRcs
 
 Note:
-- This will always overwrite each input .sfs file in-place (no backups).
+- This will always overwrite each input .sfs file in-place (no backups). The new
+  contents are written to a uniquely named temporary file in the same folder
+  first and then atomically swapped in.
 - Use --dry-run to see counts of replacements that would be made without writing.
+- Files are processed in parallel worker processes; use --jobs 1 to process them
+  one at a time.
 """
 
 from __future__ import annotations
 import argparse
+import io
+import mmap
 import sys
 import os
 import re
-from typing import Dict, List, Tuple
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr
+from functools import partial
+from typing import Dict, List, Optional, Tuple
 from collections import Counter
 
 MAPPINGS: Dict[str, str] = {
@@ -46,29 +58,79 @@ MAPPINGS: Dict[str, str] = {
     "linearRcs.old": "linearRcs",
 }
 
+# The same table as raw bytes, which is what the files are patched as
+BYTE_MAPPINGS: Dict[bytes, bytes] = {k.encode("ascii"): v.encode("ascii") for k, v in MAPPINGS.items()}
+
 
 def build_pattern(mapping_keys):
     # Build a regex that matches any of the keys when directly preceded by
     # "name = " or "rTrf = " (exact spacing). Using a fixed-width lookbehind.
-    joined = "|".join(re.escape(k) for k in mapping_keys)
+    # Files are scanned as raw bytes, so the pattern is a bytes pattern.
+    # Longest keys first, so a key that is a prefix of another can never win.
+    keys = sorted(mapping_keys, key=len, reverse=True)
+    joined = b"|".join(re.escape(k.encode("ascii")) for k in keys)
+    # The pattern starts with the literal " = " so the regex engine can skip ahead with
+    # a fast literal search, and only checks the lookbehind and the alternation where
+    # " = " occurs, instead of at every position in the file. The token is group 1.
     # Ensure token boundary so we don't replace substrings in longer names.
-    pattern = re.compile(r"(?<=name = |rTrf = )(" + joined + r")\b")
+    # Non-ASCII bytes are treated as word characters, like letters such as "é" are for
+    # a str pattern's \b.
+    pattern = re.compile(rb" = (?<=name = |rTrf = )(" + joined + rb")(?![\w\x80-\xff])")
     return pattern
 
 
-def process_text_and_count(text: str, pattern: re.Pattern, mapping: Dict[str, str]) -> Tuple[str, Counter]:
+def find_replacements(data, pattern: re.Pattern) -> List[Tuple[int, int, bytes]]:
     """
-    Return (new_text, counts) where counts is a Counter mapping original-token -> number of replacements.
+    Return (start, end, token) for every token in data that should be replaced.
+    Plain tuples are returned instead of match objects so nothing keeps a reference to data.
     """
-    counts = Counter()
+    return [(m.start(1), m.end(1), m.group(1)) for m in pattern.finditer(data)]
+
 
-    def repl(m):
-        token = m.group(1)
-        counts[token] += 1
-        return mapping.get(token, token)
+def write_replaced(out, data, spans: List[Tuple[int, int, bytes]], mapping: Dict[bytes, bytes]) -> None:
+    """
+    Write data to out with each span replaced by its mapping. The unchanged runs in
+    between are written straight from a memoryview of data, without copying them first.
+    """
+    with memoryview(data) as view:
+        pos = 0
+        for start, end, token in spans:
+            out.write(view[pos:start])
+            out.write(mapping[token])
+            pos = end
+        out.write(view[pos:])
 
-    new_text = pattern.sub(repl, text)
-    return new_text, counts
+
+def iter_files(root: str):
+    """
+    Yield an os.DirEntry for every file under root (recursively), in the same
+    order os.walk would list them. Uses os.scandir directly so file types come
+    from the directory listing instead of a stat per entry. As with os.walk,
+    symlinks to files are yielded and symlinks to directories aren't descended into,
+    and directories that can't be listed are skipped.
+    The same helper lives in sfs-parts-renamer.py and savegame-folder-renamer.py (each
+    script runs standalone); keep the two copies identical.
+    """
+    stack = [root]
+    while stack:
+        subdirs = []
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif not (entry.is_symlink() and entry.is_dir()):
+                    yield entry
+        # Reversed so the first subdirectory is popped (and walked) first
+        stack.extend(reversed(subdirs))
+
+
+def is_sfs_name(name: str) -> bool:
+    # Check the usual spellings before paying for a lowercased copy of the name
+    return name.endswith(".sfs") or name.endswith(".SFS") or name.lower().endswith(".sfs")
 
 
 def find_sfs_files(path: str) -> List[str]:
@@ -83,50 +145,124 @@ def find_sfs_files(path: str) -> List[str]:
         else:
             return []
     if os.path.isdir(path):
-        results = []
-        for root, dirs, files in os.walk(path):
-            for fn in files:
-                if fn.lower().endswith(".sfs"):
-                    results.append(os.path.join(root, fn))
-        return results
+        return [entry.path for entry in iter_files(path) if is_sfs_name(entry.name)]
     return []
 
 
-def process_file(infile: str, pattern: re.Pattern, mapping: Dict[str, str], dry_run: bool) -> Counter:
+def process_file(infile: str, pattern: re.Pattern, mapping: Dict[bytes, bytes], dry_run: bool) -> Counter:
     """
     Process a single file. If dry_run is False, overwrite the file in-place when changes are made.
+    `mapping` is the byte form of the replacement table (see BYTE_MAPPINGS).
     Returns a Counter of replacements made (keys are original tokens).
+
+    The file is memory-mapped and scanned as raw bytes (all tokens are ASCII), so there is
+    no decode/encode round-trip and line endings are left exactly as they were. Changes
+    are written to a temporary file next to it, which then atomically replaces the
+    original, so a failure part way through never leaves a half-written save.
     """
     try:
-        with open(infile, "r", encoding="utf-8") as f:
-            original = f.read()
+        f = open(infile, "rb")
     except OSError as e:
         print(f"Error reading file {infile}: {e}", file=sys.stderr)
         return Counter()
 
-    new_text, counts = process_text_and_count(original, pattern, mapping)
-
-    if not counts:
-        return Counter()
-
-    if dry_run:
-        return counts
+    # Write next to, and replace, the file a symlinked save points at, so the link stays a link
+    target = os.path.realpath(infile)
+    tmp_path = None
+    with f:
+        try:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files can't be mapped, and can't contain a token anyway
+                return Counter()
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError as e:
+            print(f"Error reading file {infile}: {e}", file=sys.stderr)
+            return Counter()
+
+        with mm:
+            spans = find_replacements(mm, pattern)
+            if not spans:
+                return Counter()
+
+            # Tally the raw tokens (a C-level count, no per-match Python callback),
+            # then decode just the handful of distinct keys
+            counts = Counter({
+                token.decode("ascii"): n
+                for token, n in Counter(token for _, _, token in spans).items()
+            })
+            if dry_run:
+                return counts
+
+            try:
+                # Large buffer to keep the number of write syscalls down; no fsync, as
+                # durability across power loss isn't worth the latency for this tool
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp_replace_sfs_")
+                with open(fd, "wb", buffering=1 << 20) as out:
+                    write_replaced(out, mm, spans, mapping)
+            except OSError as e:
+                print(f"Error writing file {infile}: {e}", file=sys.stderr)
+                if tmp_path is not None:
+                    _remove_quietly(tmp_path)
+                return Counter()
 
     try:
-        with open(infile, "w", encoding="utf-8") as f:
-            f.write(new_text)
+        # Keep the original's permission bits, which the new temp file doesn't have
+        shutil.copymode(target, tmp_path)
+        # Only once the original is closed (Windows can't replace an open file)
+        os.replace(tmp_path, target)
     except OSError as e:
         print(f"Error writing file {infile}: {e}", file=sys.stderr)
+        _remove_quietly(tmp_path)
         return Counter()
     return counts
 
 
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# Compiled pattern for the current worker process, set up once by _init_worker
+_worker_pattern: Optional[re.Pattern] = None
+
+
+def _init_worker() -> None:
+    global _worker_pattern
+    _worker_pattern = build_pattern(MAPPINGS.keys())
+
+
+def _worker(infile: str, dry_run: bool) -> Tuple[str, Counter]:
+    """
+    Run process_file in a worker process, capturing its error output so the parent
+    can replay it in file order.
+    Returns (stderr_text, counts)
+    """
+    err = io.StringIO()
+    with redirect_stderr(err):
+        counts = process_file(infile, _worker_pattern, BYTE_MAPPINGS, dry_run)
+    return err.getvalue(), counts
+
+
+def positive_int(value: str) -> int:
+    """argparse type for --jobs: a whole number of at least 1."""
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
+
 def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Recursively perform targeted replacements in .sfs files under a given path."
     )
     parser.add_argument("input_path", help="Input .sfs file or directory to search for .sfs files")
     parser.add_argument("--dry-run", action="store_true", help="Print summary of changes but do not write files")
+    parser.add_argument("--jobs", type=positive_int, default=None, help="Number of worker processes (default: CPU count)")
     args = parser.parse_args(argv)
 
     input_path = args.input_path
@@ -137,12 +273,10 @@ def main(argv=None):
         print(f"No .sfs files found at: {input_path}", file=sys.stderr)
         return 2
 
-    pattern = build_pattern(MAPPINGS.keys())
     total_counts = Counter()
     files_changed = []
 
-    for fpath in files:
-        counts = process_file(fpath, pattern, MAPPINGS, dry_run)
+    def record(fpath: str, counts: Counter) -> None:
         if counts:
             total_counts.update(counts)
             files_changed.append((fpath, sum(counts.values())))
@@ -150,6 +284,19 @@ def main(argv=None):
             if not dry_run:
                 print(f"Edited in place: {fpath} ({sum(counts.values())} replacement(s))")
 
+    if len(files) == 1 or args.jobs == 1:
+        pattern = build_pattern(MAPPINGS.keys())
+        for fpath in files:
+            record(fpath, process_file(fpath, pattern, BYTE_MAPPINGS, dry_run))
+    else:
+        # Files are independent, so spread them across processes. Each worker compiles
+        # the pattern once; results (and error output) are handled here in file order.
+        worker = partial(_worker, dry_run=dry_run)
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker) as executor:
+            for fpath, (err, counts) in zip(files, executor.map(worker, files, chunksize=4)):
+                sys.stderr.write(err)
+                record(fpath, counts)
+
     if not total_counts:
         print("No replacements needed.")
         return 0